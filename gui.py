@@ -6,12 +6,76 @@ PhotoShutterInspector — GUI версия с drag&drop.
 
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext
+import tkinter.font as tkfont
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from photoshutterinspector import PhotoShutterInspector, format_analysis_pretty, format_comparison_pretty
+from photoshutterinspector import (
+    PhotoShutterInspector, format_analysis_pretty, format_comparison_pretty, SUPPORTED_EXTENSIONS,
+    DEFAULT_CACHE_PATH
+)
+
+# Фильтр диалога выбора файла, строится один раз
+FILE_TYPES = [("Images", ' '.join('*' + ext for ext in sorted(SUPPORTED_EXTENSIONS)))]
+
+# Колонки таблицы результатов: id -> (заголовок, ширина)
+RESULT_COLUMNS = {
+    'file': ("Файл", 180),
+    'model': ("Модель", 160),
+    'shutter': ("Пробег", 100),
+    'notes': ("Замечания", 360),
+}
+
+# Максимум строк в окне вывода (старые удаляются)
+OUTPUT_MAX_LINES = 5000
+
+
+class CompareDialog(tk.Toplevel):
+    """Выбор двух файлов для сравнения в одном окне (пути можно вставить)."""
+    
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("🔍 Сравнение файлов")
+        self.transient(parent)
+        self.resizable(True, False)
+        self.f1 = self.f2 = None
+        
+        self.vars = []
+        for row, title in enumerate(("Первый файл:", "Второй файл:")):
+            var = tk.StringVar()
+            self.vars.append(var)
+            ttk.Label(self, text=title).grid(row=row, column=0, sticky='w', padx=10, pady=5)
+            ttk.Entry(self, textvariable=var, width=60).grid(row=row, column=1, sticky='ew', pady=5)
+            ttk.Button(self, text="…", width=3,
+                       command=lambda v=var, t=title: self.browse(v, t)).grid(row=row, column=2, padx=10)
+        self.columnconfigure(1, weight=1)
+        
+        buttons = ttk.Frame(self)
+        buttons.grid(row=2, column=0, columnspan=3, sticky='e', padx=10, pady=10)
+        ttk.Button(buttons, text="Сравнить", command=self.ok).pack(side='left', padx=5)
+        ttk.Button(buttons, text="Отмена", command=self.destroy).pack(side='left')
+        self.bind('<Return>', lambda e: self.ok())
+        self.bind('<Escape>', lambda e: self.destroy())
+        # В X11 захват ввода невидимым окном падает с "grab failed: window not viewable"
+        self.wait_visibility()
+        self.grab_set()
+    
+    def browse(self, var, title):
+        path = filedialog.askopenfilename(parent=self, title=title, filetypes=FILE_TYPES)
+        if path:
+            var.set(path)
+    
+    def ok(self):
+        f1, f2 = (v.get().strip() for v in self.vars)
+        if f1 and f2:
+            self.f1, self.f2 = f1, f2
+            self.destroy()
 
 
 class PhotoShutterGUI:
+    SEP = "\n\n"  # Разделитель блоков вывода
+    
     def __init__(self, root):
         self.root = root
         self.root.title("📷 PhotoShutterInspector")
@@ -19,8 +83,36 @@ class PhotoShutterGUI:
         self.root.configure(bg='#1e1e1e')
         
         self.inspector = None
-        self.init_inspector()
+        
+        # Общий пул рабочих потоков для задач кнопок; результаты
+        # (callback, result) -> results, разбираются в главном потоке по событию <<Result>>
+        self.pool = ThreadPoolExecutor(max_workers=4)
+        self.closing = threading.Event()  # Окно закрывается: длинные задачи прерываются
+        self.results = deque()
+        self.root.bind('<<Result>>', self.on_result)
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
+        
+        # Строки вывода, строки таблицы и прогресс копятся и попадают в окно раз в 100 мс
+        self.pending = []
+        self.pending_rows = []
+        self.pending_progress = None  # (готово, всего)
+        self.pending_lock = threading.Lock()
+        self.details = {}  # id строки таблицы -> FileAnalysis (отчёт строится по клику)
+        
+        # Проверка ExifTool и загрузка кэша — в рабочем потоке, окно рисуется сразу
+        self.exiftool_status = "⏳ Поиск ExifTool..."
+        self.mono10 = tkfont.Font(root=self.root, family='Consolas', size=10)
+        self.mono14b = tkfont.Font(root=self.root, family='Consolas', size=14, weight='bold')
         self.create_widgets()
+        self.submit(self.startup, callback=self.set_status)
+        self.root.after(100, self.flush)
+    
+    def startup(self):
+        self.init_inspector()
+        return self.exiftool_status
+    
+    def set_status(self, text):
+        self.status_label.configure(text=text)
     
     def init_inspector(self):
         # Ищем exiftool рядом с exe/скриптом
@@ -37,8 +129,10 @@ class PhotoShutterGUI:
             exiftool_path = 'exiftool'  # Fallback на PATH
         
         try:
-            self.inspector = PhotoShutterInspector(exiftool_path=str(exiftool_path))
+            self.inspector = PhotoShutterInspector(exiftool_path=str(exiftool_path), cache_path=str(DEFAULT_CACHE_PATH))
             self.exiftool_status = f"✅ ExifTool {self.inspector.exiftool_version}"
+            # Первый файл не ждёт запуска ExifTool
+            self.inspector.warm_up(1)
         except RuntimeError as e:
             self.inspector = None
             self.exiftool_status = f"❌ {str(e)}"
@@ -47,8 +141,9 @@ class PhotoShutterGUI:
         # Header
         header = ttk.Frame(self.root)
         header.pack(fill='x', padx=20, pady=10)
-        ttk.Label(header, text="📷 PhotoShutterInspector", font=('Consolas', 14, 'bold')).pack(side='left')
-        ttk.Label(header, text=self.exiftool_status).pack(side='right')
+        ttk.Label(header, text="📷 PhotoShutterInspector", font=self.mono14b).pack(side='left')
+        self.status_label = ttk.Label(header, text=self.exiftool_status)
+        self.status_label.pack(side='right')
         
         # Warning
         ttk.Label(self.root, text="⚠️ Для Canon shutter count часто НЕ записывается в файл!", foreground='#ff6b6b').pack(padx=20)
@@ -61,34 +156,180 @@ class PhotoShutterGUI:
         ttk.Button(btn, text="🔍 Сравнить", command=self.compare_files).pack(side='left', padx=5)
         ttk.Button(btn, text="🗑️ Очистить", command=self.clear).pack(side='right')
         
-        # Output
-        self.output = scrolledtext.ScrolledText(self.root, font=('Consolas', 10), bg='#2d2d2d', fg='#d4d4d4')
-        self.output.pack(fill='both', expand=True, padx=20, pady=10)
+        # Progress
+        self.progress = ttk.Progressbar(self.root, mode='determinate')
+        self.progress.pack(fill='x', padx=20)
+        
+        panes = ttk.PanedWindow(self.root, orient='vertical')
+        panes.pack(fill='both', expand=True, padx=20, pady=10)
+        
+        # Results: одна строка на файл, Tk отрисовывает только видимые строки
+        table = ttk.Frame(panes)
+        self.tree = ttk.Treeview(table, columns=tuple(RESULT_COLUMNS), show='headings')
+        for column, (title, width) in RESULT_COLUMNS.items():
+            self.tree.heading(column, text=title, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, stretch=(column == 'notes'))
+        scroll = ttk.Scrollbar(table, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scroll.set)
+        self.tree.pack(side='left', fill='both', expand=True)
+        scroll.pack(side='right', fill='y')
+        self.tree.bind('<<TreeviewSelect>>', self.show_selected)
+        panes.add(table, weight=1)
+        
+        # Output: полный отчёт по выбранному файлу, результаты сравнения
+        self.output = scrolledtext.ScrolledText(panes, font=self.mono10, bg='#2d2d2d', fg='#d4d4d4',
+                                                 state='disabled')
+        panes.add(self.output, weight=2)
+    
+    def submit(self, fn, *args, callback=None):
+        """Выполнить задачу в пуле рабочих потоков."""
+        self.pool.submit(self.run_job, fn, args, callback)
+    
+    def run_job(self, fn, args, callback):
+        try:
+            result = fn(*args)
+        except Exception as e:
+            callback, result = self.log, f"❌ Ошибка: {e}"
+        if callback:
+            self.post(callback, result)
+    
+    def post(self, callback, result):
+        """Передать результат в главный поток (из любого потока)."""
+        if self.closing.is_set():
+            return
+        self.results.append((callback, result))
+        try:
+            self.root.event_generate('<<Result>>', when='tail')
+        except (tk.TclError, RuntimeError):
+            # Окно уже уничтожено (TclError) или mainloop завершился:
+            # Tcl с потоками отвечает RuntimeError "main thread is not in main loop"
+            pass
+    
+    def on_result(self, event=None):
+        """Разбор результатов в главном потоке Tk."""
+        while self.results:
+            callback, result = self.results.popleft()
+            callback(result)
     
     def select_file(self):
-        path = filedialog.askopenfilename(filetypes=[("Images", "*.jpg *.jpeg *.cr2 *.cr3 *.nef *.arw")])
+        path = filedialog.askopenfilename(filetypes=FILE_TYPES)
         if path and self.inspector:
-            threading.Thread(target=lambda: self.log(format_analysis_pretty(self.inspector.analyze_file(path))), daemon=True).start()
+            self.submit(self.open_file, path)
+    
+    def open_file(self, path):
+        analysis = self.inspector.analyze_file(path)
+        self.add_result(analysis)
+        self.log(format_analysis_pretty(analysis))
     
     def select_folder(self):
         path = filedialog.askdirectory()
         if path and self.inspector:
-            def run():
-                for a in self.inspector.analyze_directory(path):
-                    self.log(format_analysis_pretty(a))
-            threading.Thread(target=run, daemon=True).start()
+            self.submit(self.scan_folder, path)
+    
+    def scan_folder(self, path):
+        files = self.inspector.list_directory(path)
+        total = len(files)
+        done = 0
+        
+        def report(analysis):
+            nonlocal done
+            self.add_result(analysis)
+            done += 1
+            self.set_progress((done, total))
+        
+        self.set_progress((0, total))
+        # Файлы анализируются параллельно на пуле процессов ExifTool инспектора,
+        # уже известные берутся из его кэша
+        for analysis in self.inspector.analyze_directory_batch(files):
+            if self.closing.is_set():
+                return
+            report(analysis)
     
     def compare_files(self):
-        f1 = filedialog.askopenfilename(title="Первый файл")
-        f2 = filedialog.askopenfilename(title="Второй файл") if f1 else None
+        dlg = CompareDialog(self.root)
+        self.root.wait_window(dlg)
+        f1, f2 = dlg.f1, dlg.f2
         if f1 and f2 and self.inspector:
-            threading.Thread(target=lambda: self.log(format_comparison_pretty(self.inspector.compare_files(f1, f2))), daemon=True).start()
+            self.submit(lambda a, b: format_comparison_pretty(self.inspector.compare_files(a, b)), f1, f2,
+                        callback=self.log)
+    
+    def add_result(self, analysis):
+        """Добавить файл в таблицу (из любого потока)."""
+        if analysis.shutter_count_present:
+            shutter = f"{analysis.shutter_count:,}"
+        else:
+            shutter = "нет в файле"
+        if analysis.file_type_mismatch:
+            notes = "🚨 Расширение не соответствует содержимому"
+        else:
+            notes = analysis.editing_detected_warning or '; '.join(analysis.errors)
+        values = (analysis.file_name, analysis.camera_model or 'н/д', shutter, notes)
+        with self.pending_lock:
+            self.pending_rows.append((values, analysis))
+    
+    def show_selected(self, event=None):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.details:
+            self.output.configure(state='normal')
+            self.output.delete('1.0', 'end')
+            self.output.insert('end', format_analysis_pretty(self.details[selection[0]]))
+            self.output.configure(state='disabled')
+    
+    def sort_by(self, column):
+        def key(value):
+            # Числа (пробег) — по значению, впереди строк
+            number = value.replace(',', '')
+            return (0, int(number), '') if number.isdigit() else (1, 0, value)
+        
+        rows = [(key(self.tree.set(iid, column)), iid) for iid in self.tree.get_children('')]
+        rows.sort()
+        for index, (_, iid) in enumerate(rows):
+            self.tree.move(iid, '', index)
+    
+    def set_progress(self, state):
+        """Прогресс (готово, всего) из любого потока: применяется при следующем flush()."""
+        with self.pending_lock:
+            self.pending_progress = state
     
     def log(self, msg):
-        self.root.after(0, lambda: (self.output.insert('end', msg + "\n\n"), self.output.see('end')))
+        """Вывод из любого потока: строка попадает в окно при следующем flush()."""
+        with self.pending_lock:
+            self.pending += (msg, self.SEP)
+    
+    def flush(self):
+        """Вставка накопленного вывода одним вызовом Tcl (главный поток)."""
+        with self.pending_lock:
+            text = ''.join(self.pending)
+            self.pending.clear()
+            rows, self.pending_rows = self.pending_rows, []
+            progress, self.pending_progress = self.pending_progress, None
+        if progress is not None:
+            done, total = progress
+            self.progress.configure(maximum=max(total, 1), value=done)
+        for values, analysis in rows:
+            self.details[self.tree.insert('', 'end', values=values)] = analysis
+        if text:
+            self.output.configure(state='normal')
+            self.output.insert('end', text)
+            lines = int(self.output.index('end-1c').split('.')[0])
+            if lines > OUTPUT_MAX_LINES:
+                self.output.delete('1.0', f'{lines - OUTPUT_MAX_LINES + 1}.0')
+            self.output.configure(state='disabled')
+            self.output.see('end')
+        self.root.after(100, self.flush)
+    
+    def close(self):
+        # Потоки пула не фоновые: очередь задач отменяется, сканирование папки останавливается
+        self.closing.set()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
     
     def clear(self):
+        self.tree.delete(*self.tree.get_children(''))
+        self.details.clear()
+        self.output.configure(state='normal')
         self.output.delete('1.0', 'end')
+        self.output.configure(state='disabled')
 
 
 if __name__ == '__main__':
@@ -13,17 +13,158 @@ PhotoShutterInspector — Честный анализатор EXIF для про
 """
 
 import subprocess
+import atexit
 import json
+import sqlite3
+import threading
+import queue
+import mmap
+import struct
 import sys
 import os
+import tempfile
 import re
 import csv
 import argparse
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, List, Any, Tuple
-from dataclasses import dataclass, asdict, field
+from typing import Optional, Dict, List, Any, Tuple, Iterator, Iterable, Union
+from dataclasses import dataclass, field, fields
 from enum import Enum
+from contextlib import contextmanager
+from operator import attrgetter
+from stat import S_IMODE, S_ISDIR, S_ISREG
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyexiv2  # Опционально: чтение EXIF через Exiv2 (C++) без запуска ExifTool
+except ImportError:
+    pyexiv2 = None
+
+try:
+    import ahocorasick  # Опционально: поиск всех редакторов за один проход (pyahocorasick)
+except ImportError:
+    ahocorasick = None
+
+try:
+    import exifread  # Опционально: быстрое чтение заголовка JPEG без ExifTool
+except ImportError:
+    exifread = None
+
+try:
+    import orjson  # Опционально: быстрый разбор и сериализация JSON
+except ImportError:
+    orjson = None
+
+# Разбор JSON (ответы ExifTool, кэш): orjson в разы быстрее json на больших MakerNotes.
+# orjson.JSONDecodeError — подкласс json.JSONDecodeError.
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
+# Номер файла в имени: IMG_1234, DSC_1234, _MG_1234 или 4+ цифры перед расширением
+_FILE_NUMBER_RE = re.compile(
+    r'(?:IMG|DSC|_MG|_DSC)_?(\d+)|(\d{4,})\.(?:jpg|jpeg|cr2|cr3|nef|arw)',
+    re.IGNORECASE
+)
+
+def _parse_exif_datetime(value: str) -> datetime:
+    """
+    Разбор даты EXIF "2024:01:15 14:30:00" срезами, без strptime.
+    
+    Дробные секунды и часовой пояс отбрасываются; ValueError — если дата некорректна.
+    """
+    value = value.split('.')[0].split('+')[0]
+    if len(value) < 19:
+        raise ValueError(f"Некорректная дата EXIF: {value!r}")
+    return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                    int(value[11:13]), int(value[14:16]), int(value[17:19]))
+
+
+def _suffix(name: str) -> str:
+    """Расширение имени файла с точкой, как Path.suffix, но без разбора пути."""
+    dot = name.rfind('.')
+    return name[dot:] if 0 < dot < len(name) - 1 else ''
+
+
+def _stat(file: Union[str, os.DirEntry]) -> Optional[os.stat_result]:
+    """os.stat пути или записи os.scandir; None, если файл недоступен."""
+    try:
+        return file.stat() if isinstance(file, os.DirEntry) else os.stat(file)
+    except OSError:
+        return None
+
+
+# Сколько байт с начала файла подгружать заранее: метаданные (EXIF, MakerNotes)
+# лежат в заголовке, весь RAW читать незачем
+_READAHEAD_BYTES = 1 << 18
+
+
+def _readahead(file_path: str) -> None:
+    """Попросить ядро асинхронно прочитать заголовок файла (только POSIX)."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, _READAHEAD_BYTES, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# Поддерживаемые расширения (в нижнем регистре, с точкой)
+SUPPORTED_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.heic', '.hif', '.tif', '.tiff',
+    '.cr2', '.cr3', '.nef', '.arw', '.orf', '.rw2', '.raf', '.dng',
+})
+# Кэш результатов анализа между запусками (SQLite)
+DEFAULT_CACHE_PATH = Path.home() / '.cache' / 'photoshutterinspector.db'
+
+# То же кортежем — для str.endswith
+_SUPPORTED_SUFFIXES = tuple(SUPPORTED_EXTENSIONS)
+
+
+def _iter_photos(root: str, recursive: bool = False) -> Iterator[os.DirEntry]:
+    """
+    Записи os.scandir поддерживаемых файлов в директории.
+    
+    Расширение проверяется по имени до обращения к файлу: остальные записи
+    не открываются и не stat-ятся. Недоступные поддиректории пропускаются.
+    """
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.name.lower().endswith(_SUPPORTED_SUFFIXES) and entry.is_file():
+                yield entry
+            elif recursive and entry.is_dir(follow_symlinks=False):
+                try:
+                    yield from _iter_photos(entry.path, recursive)
+                except OSError:
+                    continue
+
+
+# Расширение -> допустимые значения File:FileType (иначе файл подделан)
+_EXPECTED_FILE_TYPES = {
+    'cr2': frozenset({'CR2'}),
+    'cr3': frozenset({'CR3'}),
+    'jpg': frozenset({'JPEG', 'JPG'}),
+    'jpeg': frozenset({'JPEG', 'JPG'}),
+    # Для файлов с брендом mif1 ExifTool сообщает HEIF; .HIF — HEIF камер Canon и Sony
+    'heic': frozenset({'HEIC', 'HEIF'}),
+    'hif': frozenset({'HEIC', 'HEIF'}),
+    'tif': frozenset({'TIFF'}),
+    'tiff': frozenset({'TIFF'}),
+    'nef': frozenset({'NEF'}),
+    'arw': frozenset({'ARW'}),
+    'orf': frozenset({'ORF'}),
+    'rw2': frozenset({'RW2'}),
+    'raf': frozenset({'RAF'}),
+    'dng': frozenset({'DNG'}),
+}
 
 
 class VerificationResult(Enum):
@@ -33,7 +174,7 @@ class VerificationResult(Enum):
     SUSPICIOUS = "SUSPICIOUS"
 
 
-@dataclass
+@dataclass(slots=True)
 class FileAnalysis:
     """Результат анализа одного файла."""
     file_name: str
@@ -92,9 +233,49 @@ class FileAnalysis:
     
     # Сырые данные ExifTool (опционально)
     raw_exif: Optional[Dict] = None
+    
+    def to_dict(self) -> Dict:
+        """Словарь для JSON/CSV (без raw_exif)."""
+        return {
+            'file_name': self.file_name,
+            'file_path': self.file_path,
+            'file_type': self.file_type,
+            'file_size_bytes': self.file_size_bytes,
+            'real_file_type': self.real_file_type,
+            'mime_type': self.mime_type,
+            'file_type_mismatch': self.file_type_mismatch,
+            'camera_make': self.camera_make,
+            'camera_model': self.camera_model,
+            'lens_model': self.lens_model,
+            'serial_number': self.serial_number,
+            'internal_serial': self.internal_serial,
+            'firmware': self.firmware,
+            'datetime_original': self.datetime_original,
+            'datetime_digitized': self.datetime_digitized,
+            'file_modify_date': self.file_modify_date,
+            'shutter_count': self.shutter_count,
+            'shutter_count_source': self.shutter_count_source,
+            'shutter_count_present': self.shutter_count_present,
+            'file_number_hint': self.file_number_hint,
+            'file_number_warning': self.file_number_warning,
+            'directory_number': self.directory_number,
+            'image_unique_id': self.image_unique_id,
+            'software': self.software,
+            'processing_software': self.processing_software,
+            'not_out_of_camera': self.not_out_of_camera,
+            'editing_detected_warning': self.editing_detected_warning,
+            'iso': self.iso,
+            'aperture': self.aperture,
+            'shutter_speed': self.shutter_speed,
+            'focal_length': self.focal_length,
+            'image_width': self.image_width,
+            'image_height': self.image_height,
+            'exif_integrity_notes': list(self.exif_integrity_notes),
+            'errors': list(self.errors),
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class ComparisonResult:
     """Результат сравнения двух файлов."""
     file1: str
@@ -107,6 +288,465 @@ class ComparisonResult:
     time_sequence_valid: Optional[bool] = None
     file_number_sequence_valid: Optional[bool] = None
     time_difference_seconds: Optional[float] = None
+    
+    def to_dict(self) -> Dict:
+        """Словарь для JSON (вердикт — строкой, как str(Enum))."""
+        return {
+            'file1': self.file1,
+            'file2': self.file2,
+            'verdict': str(self.verdict),
+            'reasons': list(self.reasons),
+            'same_camera_model': self.same_camera_model,
+            'same_serial_number': self.same_serial_number,
+            'same_firmware': self.same_firmware,
+            'time_sequence_valid': self.time_sequence_valid,
+            'file_number_sequence_valid': self.file_number_sequence_valid,
+            'time_difference_seconds': self.time_difference_seconds,
+        }
+
+
+class _ExifToolProcess:
+    """
+    Постоянный процесс ExifTool в режиме -stay_open.
+    
+    Команды передаются через stdin, ответ каждой заканчивается строкой {ready}.
+    Perl-интерпретатор запускается один раз на всю пачку файлов, а не на каждый файл.
+    """
+    
+    READY = b'{ready}'
+    
+    # Секунд на ответ команды — и для одного файла, и для пачки: зависший файл
+    # держит пачку не дольше, чем одиночное чтение, дальше файлы читаются по одному
+    TIMEOUT = 30
+    
+    def __init__(self, exiftool_path: str):
+        self.process = subprocess.Popen(
+            [exiftool_path, '-stay_open', 'True', '-@', '-',
+             '-common_args', '-charset', 'filename=utf8'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        # stdout читает отдельный поток: ожидание ответа ограничено по времени
+        # и в Windows, где select с каналами не работает
+        self._replies: "queue.SimpleQueue[Optional[bytes]]" = queue.SimpleQueue()
+        threading.Thread(target=self._read_replies, daemon=True).start()
+    
+    def _read_replies(self) -> None:
+        """Собирать вывод в ответы по строке {ready}; None — процесс завершился."""
+        lines = []
+        for line in self.process.stdout:
+            if line.rstrip() == self.READY:
+                self._replies.put(b''.join(lines))
+                lines = []
+            else:
+                lines.append(line)
+        self._replies.put(None)
+    
+    def execute(self, *args: str) -> bytes:
+        """
+        Выполнить одну команду ExifTool и вернуть её stdout.
+        
+        Вывод возвращается байтами, без текстового режима: JSON разбирается
+        прямо из bytes, без перекодирования и замены переводов строк.
+        Если ответа нет за TIMEOUT секунд, процесс убивается.
+        
+        Raises:
+            ValueError: аргумент с переводом строки — в файле аргументов -@ он
+                стал бы несколькими аргументами (например, опциями записи);
+                процессу при этом ничего не отправляется
+        """
+        for arg in args:
+            if '\n' in arg or '\r' in arg:
+                raise ValueError(f"Имя файла с переводом строки не передаётся ExifTool: {arg!r}")
+        # os.fsencode: имена файлов Linux не в UTF-8 передаются исходными байтами
+        self.process.stdin.write(b'\n'.join(map(os.fsencode, args)) + b'\n-execute\n')
+        self.process.stdin.flush()
+        
+        files = [arg for arg in args if not arg.startswith('-')]
+        try:
+            reply = self._replies.get(timeout=self.TIMEOUT)
+        except queue.Empty:
+            self.process.kill()
+            self.process.wait()
+            raise RuntimeError(f"ExifTool timeout for {', '.join(files)}")
+        if reply is None:
+            raise RuntimeError("ExifTool неожиданно завершил работу")
+        return reply
+    
+    def close(self) -> None:
+        """Завершить процесс ExifTool."""
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write(b'-stay_open\nFalse\n')
+                self.process.stdin.flush()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _ExifToolPool:
+    """
+    Пул постоянных процессов ExifTool.
+    
+    Каждый поток берёт свободный процесс; новые запускаются по мере надобности,
+    но не больше size одновременно.
+    """
+    
+    def __init__(self, exiftool_path: str, size: int):
+        self.exiftool_path = exiftool_path
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "queue.SimpleQueue[_ExifToolProcess]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._all: List[_ExifToolProcess] = []
+    
+    def execute(self, *args: str) -> bytes:
+        """Выполнить команду на свободном процессе пула."""
+        with self._slots:
+            try:
+                process = self._idle.get_nowait()
+            except queue.Empty:
+                process = _ExifToolProcess(self.exiftool_path)
+                with self._lock:
+                    self._all.append(process)
+            try:
+                output = process.execute(*args)
+            except ValueError:
+                # Команда отклонена до отправки — процесс исправен
+                self._idle.put(process)
+                raise
+            except (OSError, RuntimeError):
+                # Процесс упал — убираем его из пула
+                process.close()
+                with self._lock:
+                    self._all.remove(process)
+                raise
+            self._idle.put(process)
+            return output
+    
+    def prestart(self, count: int) -> None:
+        """
+        Заранее запустить процессы, чтобы всего их было не меньше count (и не больше size).
+        
+        Popen не ждёт загрузки Perl: процессы стартуют параллельно
+        с остальной работой, и первый файл не платит за запуск ExifTool.
+        """
+        with self._lock:
+            count = min(count, self.size) - len(self._all)
+            for _ in range(count):
+                process = _ExifToolProcess(self.exiftool_path)
+                self._all.append(process)
+                self._idle.put(process)
+    
+    def close(self) -> None:
+        """Завершить все процессы пула."""
+        with self._lock:
+            processes, self._all = self._all, []
+        for process in processes:
+            process.close()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+
+def _to_number(text: str) -> Any:
+    """
+    Строковое значение тега -> число (int, рациональное "a/b" -> float), как ExifTool -n -j.
+    
+    Как и JSON ExifTool, числа с ведущими нулями ("0012345") остаются строками.
+    """
+    text = text.strip()
+    if re.fullmatch(r'-?(?:\d|[1-9]\d{1,14})', text):
+        return int(text)
+    match = re.fullmatch(r'(-?\d+)/(\d+)', text)
+    if match and int(match.group(2)):
+        return int(match.group(1)) / int(match.group(2))
+    return text
+
+
+def _exif_file_date(st: os.stat_result) -> str:
+    """Время изменения файла в формате File:FileModifyDate ExifTool: "2024:01:15 14:30:00+03:00"."""
+    text = datetime.fromtimestamp(st.st_mtime).astimezone().strftime('%Y:%m:%d %H:%M:%S%z')
+    return f"{text[:-2]}:{text[-2:]}"
+
+
+def _iter_jpeg_segments(buf) -> Iterator[Tuple[int, int, int]]:
+    """Сегменты заголовка JPEG до данных изображения: (маркер, начало содержимого, конец)."""
+    pos = 2
+    while pos + 4 <= len(buf):
+        marker, length = struct.unpack_from('>HH', buf, pos)
+        if marker >> 8 != 0xFF or marker in (0xFFD9, 0xFFDA):
+            break
+        yield marker, pos + 4, pos + 2 + length
+        pos += 2 + length
+
+
+_XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+_CREATOR_TOOL_RE = re.compile(rb'CreatorTool(?:="([^"]*)"|>([^<]*)<)')
+
+
+def _read_jpeg_xmp(buf, exif: Dict[str, Any]) -> None:
+    """XMP CreatorTool из сегмента APP1 JPEG — в exif как XMP:CreatorTool."""
+    for marker, start, end in _iter_jpeg_segments(buf):
+        if marker == 0xFFE1 and buf[start:start + len(_XMP_HEADER)] == _XMP_HEADER:
+            match = _CREATOR_TOOL_RE.search(buf, start, end)
+            if match:
+                value = (match.group(1) or match.group(2)).decode('utf-8', 'replace').strip()
+                if value:
+                    exif.setdefault('XMP:CreatorTool', value)
+            return
+
+
+class JpegExifBackend:
+    """
+    Разбор EXIF JPEG-файла средствами стандартной библиотеки (mmap + struct).
+    
+    Читаются только сегменты APP1: IFD0, Exif IFD, makernote Nikon (ShutterCount)
+    и XMP CreatorTool. Миниатюры и данные изображения не копируются в память.
+    """
+    
+    # Расширения, для которых backend имеет смысл пробовать
+    EXTENSIONS = frozenset({'.jpg', '.jpeg'})
+    
+    # Производители (EXIF:Make), makernote которых backend читает полностью;
+    # для остальных ExifTool находит теги, нужные проверкам анализа
+    # (например, OriginalImageWidth для детектора ресайза)
+    COMPLETE_MAKES = ('NIKON',)
+    
+    # Стандартные теги -> имена ExifTool
+    EXIF_TAGS = {
+        0x000B: 'ProcessingSoftware',
+        0x010F: 'Make',
+        0x0110: 'Model',
+        0x0131: 'Software',
+        0x829A: 'ExposureTime',
+        0x829D: 'FNumber',
+        0x8827: 'ISO',
+        0x9003: 'DateTimeOriginal',
+        0x9004: 'CreateDate',
+        0x920A: 'FocalLength',
+        0xA002: 'ExifImageWidth',
+        0xA003: 'ExifImageHeight',
+        0xA420: 'ImageUniqueID',
+        0xA431: 'SerialNumber',
+        0xA434: 'LensModel',
+    }
+    
+    # Makernote Nikon (тип 3)
+    NIKON_TAGS = {
+        0x001D: 'SerialNumber',
+        0x00A7: 'ShutterCount',
+    }
+    
+    EXIF_IFD = 0x8769
+    MAKER_NOTE = 0x927C
+    
+    # Тип TIFF -> (формат struct, размер)
+    TYPES = {1: ('B', 1), 2: ('s', 1), 3: ('H', 2), 4: ('I', 4), 5: ('II', 8),
+             7: ('s', 1), 9: ('i', 4), 10: ('ii', 8)}
+    
+    def _find_tiff_header(self, mm: mmap.mmap) -> int:
+        """Смещение TIFF-заголовка внутри сегмента APP1 'Exif'."""
+        for marker, start, _ in _iter_jpeg_segments(mm):
+            if marker == 0xFFE1 and mm[start:start + 6] == b'Exif\x00\x00':
+                return start + 6
+        raise ValueError("Сегмент EXIF не найден")
+    
+    def _read_ifd(self, mm: mmap.mmap, base: int, offset: int, order: str) -> Dict[int, Tuple[int, int, int]]:
+        """Записи IFD: тег -> (тип, количество, абсолютное смещение значения)."""
+        entries = {}
+        start = base + offset
+        if start + 2 > len(mm):
+            return entries
+        count = struct.unpack_from(order + 'H', mm, start)[0]
+        for i in range(count):
+            entry = start + 2 + i * 12
+            if entry + 12 > len(mm):
+                break
+            tag, typ, n = struct.unpack_from(order + 'HHI', mm, entry)
+            if typ not in self.TYPES:
+                continue
+            size = self.TYPES[typ][1] * n
+            value_at = entry + 8 if size <= 4 else base + struct.unpack_from(order + 'I', mm, entry + 8)[0]
+            if value_at + size <= len(mm):
+                entries[tag] = (typ, n, value_at)
+        return entries
+    
+    def _value(self, mm: mmap.mmap, order: str, typ: int, n: int, at: int) -> Any:
+        """Первое значение тега (строки — целиком)."""
+        fmt = self.TYPES[typ][0]
+        if fmt == 's':
+            # Строки из одних цифр (серийный номер) ExifTool -j отдаёт числами
+            return _to_number(mm[at:at + n].split(b'\x00', 1)[0].decode('utf-8', 'replace'))
+        if len(fmt) == 2:
+            num, den = struct.unpack_from(order + fmt, mm, at)
+            return num / den if den else None
+        return struct.unpack_from(order + fmt, mm, at)[0]
+    
+    def _read_tags(self, mm: mmap.mmap, entries: Dict, order: str, names: Dict[int, str],
+                   group: str, exif: Dict[str, Any]) -> None:
+        for tag, name in names.items():
+            if tag in entries:
+                value = self._value(mm, order, *entries[tag])
+                if value not in (None, ''):
+                    exif.setdefault(f"{group}:{name}", value)
+    
+    def read(self, file_path: str) -> Dict[str, Any]:
+        """Прочитать EXIF JPEG-файла в формате, совместимом с выводом ExifTool."""
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:3] != b'\xff\xd8\xff':
+                raise ValueError("Не JPEG")
+            tiff = self._find_tiff_header(mm)
+            order = {b'II': '<', b'MM': '>'}[mm[tiff:tiff + 2]]
+            
+            exif: Dict[str, Any] = {'File:FileType': 'JPEG', 'File:MIMEType': 'image/jpeg'}
+            _read_jpeg_xmp(mm, exif)
+            ifd0 = self._read_ifd(mm, tiff, struct.unpack_from(order + 'I', mm, tiff + 4)[0], order)
+            self._read_tags(mm, ifd0, order, self.EXIF_TAGS, 'EXIF', exif)
+            if self.EXIF_IFD not in ifd0:
+                return exif
+            
+            exif_ifd = self._read_ifd(mm, tiff, self._value(mm, order, *ifd0[self.EXIF_IFD]), order)
+            self._read_tags(mm, exif_ifd, order, self.EXIF_TAGS, 'EXIF', exif)
+            
+            # Makernote Nikon: "Nikon\0" + версия, затем собственный TIFF-заголовок
+            if self.MAKER_NOTE in exif_ifd:
+                _, _, note = exif_ifd[self.MAKER_NOTE]
+                if mm[note:note + 6] == b'Nikon\x00' and mm[note + 10:note + 12] in (b'II', b'MM'):
+                    note_base = note + 10
+                    note_order = '<' if mm[note_base:note_base + 2] == b'II' else '>'
+                    note_ifd = self._read_ifd(
+                        mm, note_base, struct.unpack_from(note_order + 'I', mm, note_base + 4)[0], note_order
+                    )
+                    self._read_tags(mm, note_ifd, note_order, self.NIKON_TAGS, 'MakerNotes', exif)
+            return exif
+
+
+class Pyexiv2Backend:
+    """
+    Чтение метаданных через pyexiv2 (Exiv2, C++) внутри процесса Python.
+    
+    Ключи Exiv2 (Exif.Canon.ShutterCount) приводятся к виду ExifTool
+    (MakerNotes:ShutterCount), значения — к числам, как с флагом -n.
+    """
+    
+    EXTENSIONS = SUPPORTED_EXTENSIONS
+    
+    # См. JpegExifBackend.COMPLETE_MAKES
+    COMPLETE_MAKES = ('NIKON',)
+    
+    # Группы Exiv2, соответствующие группе EXIF в ExifTool; остальные — MakerNotes
+    EXIF_GROUPS = {'Image', 'Photo', 'Iop', 'GPSInfo', 'Thumbnail'}
+    
+    # Теги, которые в Exiv2 называются иначе, чем в ExifTool
+    TAG_NAMES = {
+        'ISOSpeedRatings': 'ISO',
+        'BodySerialNumber': 'SerialNumber',
+        'PixelXDimension': 'ExifImageWidth',
+        'PixelYDimension': 'ExifImageHeight',
+    }
+    
+    MIME_TO_FILE_TYPE = {
+        'image/jpeg': 'JPEG',
+        'image/x-canon-cr2': 'CR2',
+        'image/x-canon-cr3': 'CR3',
+        'image/x-nikon-nef': 'NEF',
+        'image/x-sony-arw': 'ARW',
+        'image/x-olympus-orf': 'ORF',
+        'image/x-panasonic-rw2': 'RW2',
+        'image/x-adobe-dng': 'DNG',
+        'image/png': 'PNG',
+        'image/webp': 'WEBP',
+        'image/tiff': 'TIFF',
+    }
+    
+    def read(self, file_path: str) -> Dict[str, Any]:
+        """Прочитать EXIF файла в формате, совместимом с выводом ExifTool."""
+        img = pyexiv2.Image(file_path)
+        try:
+            raw = img.read_exif()
+            xmp = img.read_xmp()
+            mime = img.get_mime_type()
+        finally:
+            img.close()
+        
+        exif: Dict[str, Any] = {}
+        file_type = self.MIME_TO_FILE_TYPE.get(mime)
+        if file_type:
+            exif['File:FileType'] = file_type
+            exif['File:MIMEType'] = mime
+        
+        for key, value in raw.items():
+            # Exif.<группа>.<тег>
+            _, group, tag = key.split('.', 2)
+            group = 'EXIF' if group in self.EXIF_GROUPS else 'MakerNotes'
+            tag = self.TAG_NAMES.get(tag, tag)
+            exif.setdefault(f"{group}:{tag}", _to_number(value) if isinstance(value, str) else value)
+        # Xmp.<пространство имён>.<тег>, например Xmp.xmp.CreatorTool
+        for key, value in xmp.items():
+            exif.setdefault(f"XMP:{key.rpartition('.')[2]}", value)
+        return exif
+
+
+class ExifreadBackend:
+    """
+    Чтение заголовка JPEG через exifread без запуска внешнего процесса.
+    
+    Миниатюры не извлекаются, разбор останавливается на теге счётчика затвора.
+    Только для JPEG: тип остальных форматов exifread не сообщает, а без него
+    не работает детектор подделок.
+    """
+    
+    EXTENSIONS = frozenset({'.jpg', '.jpeg'})
+    
+    # См. JpegExifBackend.COMPLETE_MAKES
+    COMPLETE_MAKES = ('NIKON',)
+    
+    STOP_TAG = 'TotalShutterReleases'
+    
+    # Группы exifread, соответствующие группе EXIF в ExifTool
+    EXIF_GROUPS = {'Image', 'EXIF', 'GPS', 'Interoperability', 'Thumbnail'}
+    
+    # Теги, которые в exifread называются иначе, чем в ExifTool
+    TAG_NAMES = {
+        'ISOSpeedRatings': 'ISO',
+        'BodySerialNumber': 'SerialNumber',
+        'TotalShutterReleases': 'ShutterCount',
+    }
+    
+    @staticmethod
+    def _convert_value(tag) -> Any:
+        values = tag.values
+        if isinstance(values, str):
+            return _to_number(values)
+        if len(values) == 1 and isinstance(values[0], int):
+            return values[0]
+        return _to_number(tag.printable) if len(values) == 1 else tag.printable
+    
+    def read(self, file_path: str) -> Dict[str, Any]:
+        """Прочитать EXIF JPEG-файла в формате, совместимом с выводом ExifTool."""
+        with open(file_path, 'rb') as f:
+            if f.read(3) != b'\xff\xd8\xff':
+                raise ValueError("Не JPEG")
+            f.seek(0)
+            tags = exifread.process_file(f, details=True, extract_thumbnail=False, stop_tag=self.STOP_TAG)
+            # XMP из JPEG exifread не возвращает: CreatorTool — из сегмента APP1
+            exif: Dict[str, Any] = {'File:FileType': 'JPEG', 'File:MIMEType': 'image/jpeg'}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                _read_jpeg_xmp(mm, exif)
+        
+        for key, tag in tags.items():
+            group, _, name = key.partition(' ')
+            if not name:
+                continue
+            group = 'EXIF' if group in self.EXIF_GROUPS else 'MakerNotes'
+            name = self.TAG_NAMES.get(name, name)
+            exif.setdefault(f"{group}:{name}", self._convert_value(tag))
+        return exif
 
 
 class PhotoShutterInspector:
@@ -124,6 +764,8 @@ class PhotoShutterInspector:
     
     # Теги для поиска shutter count
     SHUTTER_COUNT_TAGS = [
+        # Варианты ShutterCount: Sony (ShutterCount2/3), Nikon Z (MechanicalShutterCount)
+        'ShutterCount', 'ShutterCount2', 'ShutterCount3', 'MechanicalShutterCount',
         # Canon
         'ShutterCount', 'ImageCount', 'ShutterCounter',
         'Canon:ShutterCount', 'Canon:ImageCount',
@@ -131,24 +773,213 @@ class PhotoShutterInspector:
         # Nikon
         'ShutterCount', 'Nikon:ShutterCount',
         # Sony  
-        'ImageCount', 'ReleaseMode2', 'Sony:ImageCount',
+        'ImageCount', 'ImageCount2', 'ImageCount3', 'ReleaseMode2', 'Sony:ImageCount',
         # Pentax
         'ShutterCount', 'Pentax:ShutterCount',
         # Generic
         'ActuationCount', 'ImageNumber'
     ]
     
-    SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.cr2', '.cr3', '.nef', '.arw', '.orf', '.rw2', '.dng'}
+    # Имя тега без группы (в нижнем регистре) -> приоритет (первое вхождение в списке)
+    _SHUTTER_TAG_PRIORITY = {
+        tag.lower().rpartition(':')[2]: priority
+        for priority, tag in reversed(list(enumerate(SHUTTER_COUNT_TAGS)))
+    }
+    
+    SUPPORTED_EXTENSIONS = SUPPORTED_EXTENSIONS
+    
+    # Аргументы ExifTool:
+    # -j: JSON output
+    # -G: Group names
+    # -n: Numeric values
+    # -fast: Не дочитывать JPEG до конца в поисках трейлеров
+    #        (-fast2 не подходит: пропускает MakerNotes, где хранится shutter count)
+    EXIFTOOL_ARGS = ['-j', '-G', '-n', '-fast']
+    
+    # Полное чтение (deep, сырые данные):
+    # -a: Allow duplicate tags
+    # -u: Unknown tags
+    DEEP_EXIFTOOL_ARGS = ['-j', '-G', '-a', '-u', '-n']
+    
+    # Теги, которые читает анализ: ExifTool не извлекает остальное
+    # (сотни тегов, крупные блоки MakerNotes). Полный вывод — только с include_raw_exif.
+    # Теги пробега берутся из SHUTTER_COUNT_TAGS, а не перечисляются здесь: вариант,
+    # добавленный в список поиска (например, ShutterCount2 Sony), запрашивается автоматически.
+    _EXIFTOOL_TAGS = [
+        '-FileType', '-MIMEType', '-Make', '-Model', '-LensModel', '-Lens', '-LensType',
+        '-SerialNumber', '-CameraSerialNumber', '-InternalSerialNumber', '-Firmware', '-FirmwareVersion',
+        '-Software', '-ProcessingSoftware', '-DateTimeOriginal', '-CreateDate', '-DateTimeDigitized',
+        '-FileModifyDate', '-FileNumber', '-FileIndex', '-DirectoryIndex', '-ImageUniqueID',
+        '-ISO', '-FNumber', '-Aperture', '-ApertureValue', '-ExposureTime', '-ShutterSpeed',
+        '-ShutterSpeedValue', '-FocalLength', '-ImageWidth', '-ImageHeight', '-ExifImageWidth',
+        '-ExifImageHeight', '-OriginalImageWidth', '-OriginalImageHeight', '-XMP:CreatorTool',
+    ] + ['-' + tag for tag in dict.fromkeys(tag.rpartition(':')[2] for tag in SHUTTER_COUNT_TAGS)]
+    
+    # Сколько последних результатов держать в памяти
+    MEMO_MAXSIZE = 4096
+    
+    # Версия формата кэша SQLite (PRAGMA user_version): увеличивать при изменении
+    # анализа, чтобы результаты прежней версии не выдавались из кэша
+    CACHE_VERSION = 1
     
-    def __init__(self, exiftool_path: str = "exiftool"):
+    # Сколько файлов пакетного анализа читать одной командой ExifTool
+    BULK_SIZE = 32
+    
+    def __init__(self, exiftool_path: str = "exiftool", use_pyexiv2: bool = True, use_exifread: bool = True,
+                 cache_path: Optional[str] = None, workers: Optional[int] = None, deep: bool = False):
         """
         Инициализация инспектора.
         
         Args:
             exiftool_path: Путь к исполняемому файлу exiftool
+            use_pyexiv2: Сначала читать EXIF через pyexiv2 (если установлен),
+                ExifTool — только когда Exiv2 не дал полного ответа
+            use_exifread: Пробовать быстрое чтение заголовка JPEG через exifread
+                (если установлен)
+            cache_path: Файл SQLite для кэша результатов между запусками
+                (None — без кэша)
+            workers: Сколько файлов анализировать параллельно
+                (по умолчанию — число ядер)
+            deep: Полное чтение ExifTool (-a -u, без -fast) для диагностики
         """
         self.exiftool_path = exiftool_path
+        self.deep = deep
+        self.native_backends = [JpegExifBackend()]
+        if use_exifread and exifread is not None:
+            self.native_backends.append(ExifreadBackend())
+        if use_pyexiv2 and pyexiv2 is not None:
+            self.native_backends.append(Pyexiv2Backend())
+        # Расширение -> подходящие backends: JPEG-читатели не открывают RAW-файлы зря
+        self._backends_by_ext = {
+            ext: [backend for backend in self.native_backends if ext in backend.EXTENSIONS]
+            for ext in self.SUPPORTED_EXTENSIONS
+        }
         self._verify_exiftool()
+        
+        # Автомат Ахо-Корасик по KNOWN_EDITORS: значение — (приоритет, имя)
+        self._editor_automaton = None
+        if ahocorasick is not None:
+            self._editor_automaton = ahocorasick.Automaton()
+            for priority, editor in enumerate(self.KNOWN_EDITORS):
+                self._editor_automaton.add_word(editor, (priority, editor))
+            self._editor_automaton.make_automaton()
+        
+        # Постоянные процессы ExifTool (-stay_open), запускаются при первом обращении
+        self.workers = workers or os.cpu_count() or 1
+        self._exiftool_pool = _ExifToolPool(exiftool_path, self.workers)
+        atexit.register(self.close)
+        
+        self._cache_db = None
+        self._cache_lock = threading.Lock()
+        # (путь, include_raw_exif) -> (mtime_ns, размер, FileAnalysis), LRU
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        if cache_path:
+            self._open_cache(cache_path)
+    
+    def warm_up(self, count: Optional[int] = None) -> None:
+        """Заранее запустить процессы ExifTool: всего count (по умолчанию — по одному на поток)."""
+        self._exiftool_pool.prestart(self.workers if count is None else count)
+    
+    def _open_cache(self, cache_path: str) -> None:
+        """
+        Открыть (создать) кэш результатов в SQLite.
+        
+        Если кэш недоступен (нет прав, файл повреждён), выводится предупреждение
+        и анализ идёт без кэша. Записи другой версии CACHE_VERSION удаляются.
+        """
+        db = None
+        try:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(cache_path, check_same_thread=False)
+            if db.execute("PRAGMA user_version").fetchone()[0] != self.CACHE_VERSION:
+                db.execute("DROP TABLE IF EXISTS analyses")
+                db.execute(f"PRAGMA user_version = {self.CACHE_VERSION:d}")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, json TEXT)"
+            )
+            db.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Кэш {cache_path} недоступен, анализ без кэша: {e}", file=sys.stderr)
+            if db is not None:
+                db.close()
+            return
+        self._cache_db = db
+    
+    def _cache_key(self, file_path: str, st: Optional[os.stat_result]) -> Optional[Tuple[str, int, int]]:
+        """
+        Ключ кэша: (абсолютный путь, mtime_ns, размер).
+        
+        None — файл недоступен или режим deep: в кэше лежат результаты обычного
+        чтения, и полное чтение не должно их ни получать, ни перезаписывать.
+        """
+        if st is None or self.deep:
+            return None
+        return str(Path(file_path).absolute()), st.st_mtime_ns, st.st_size
+    
+    def _cache_get(self, key: Tuple[str, int, int]) -> Optional[FileAnalysis]:
+        """Результат из SQLite; None — записи нет или кэш сейчас не читается."""
+        try:
+            with self._cache_lock:
+                row = self._cache_db.execute(
+                    "SELECT json FROM analyses WHERE path=? AND mtime=? AND size=?", key
+                ).fetchone()
+            return analysis_from_dict(_json_loads(row[0])) if row else None
+        except (sqlite3.Error, ValueError, TypeError):
+            return None
+    
+    def _cache_put(self, items: List[Tuple[Tuple[str, int, int], FileAnalysis]]) -> None:
+        """
+        Записать результаты в SQLite одной короткой транзакцией.
+        
+        Ошибки (например, "database is locked", пока базу пишет другой процесс)
+        не прерывают анализ: результаты просто не попадают в кэш.
+        """
+        rows = [(*key, json.dumps(analysis_to_dict(analysis), ensure_ascii=False)) for key, analysis in items]
+        with self._cache_lock:
+            try:
+                self._cache_db.executemany(
+                    "INSERT OR REPLACE INTO analyses (path, mtime, size, json) VALUES (?, ?, ?, ?)", rows
+                )
+                self._cache_db.commit()
+            except sqlite3.Error:
+                try:
+                    self._cache_db.rollback()
+                except sqlite3.Error:
+                    pass
+    
+    def _memo_get(self, key: Tuple[str, int, int], include_raw_exif: bool) -> Optional[FileAnalysis]:
+        path, mtime, size = key
+        with self._memo_lock:
+            entry = self._memo.get((path, include_raw_exif))
+            if entry is None:
+                return None
+            if entry[:2] != (mtime, size):
+                # Файл изменился — запись устарела
+                del self._memo[(path, include_raw_exif)]
+                return None
+            self._memo.move_to_end((path, include_raw_exif))
+            return entry[2]
+    
+    def _memo_put(self, key: Tuple[str, int, int], include_raw_exif: bool, analysis: FileAnalysis) -> None:
+        path, mtime, size = key
+        with self._memo_lock:
+            self._memo[(path, include_raw_exif)] = (mtime, size, analysis)
+            self._memo.move_to_end((path, include_raw_exif))
+            if len(self._memo) > self.MEMO_MAXSIZE:
+                self._memo.popitem(last=False)
+    
+    def close(self) -> None:
+        """Завершить процесс ExifTool и закрыть кэш."""
+        self._exiftool_pool.close()
+        with self._cache_lock:
+            if self._cache_db is not None:
+                try:
+                    self._cache_db.close()
+                except sqlite3.Error:
+                    pass
+                self._cache_db = None
     
     def _verify_exiftool(self) -> None:
         """Проверка доступности ExifTool."""
@@ -170,71 +1001,136 @@ class PhotoShutterInspector:
         except subprocess.TimeoutExpired:
             raise RuntimeError("ExifTool не отвечает (timeout)")
     
-    def _run_exiftool(self, file_path: str) -> Dict[str, Any]:
+    def _run_exiftool(self, file_path: str, all_tags: bool = False) -> Dict[str, Any]:
         """
-        Запуск ExifTool и получение всех метаданных.
+        Получение метаданных через пул постоянных процессов ExifTool.
         
         Args:
             file_path: Путь к файлу
+            all_tags: Все теги файла, а не только нужные для анализа
             
         Returns:
             Словарь с метаданными
         """
+        return self._parse_exiftool_json(self._exiftool_pool.execute(*self._exiftool_args(all_tags), file_path))
+    
+    def _run_exiftool_many(self, file_paths: List[str], all_tags: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Метаданные нескольких файлов одной командой ExifTool.
+        
+        Returns:
+            Путь -> метаданные; файлы, которые ExifTool не прочитал, отсутствуют
+            (в том числе имена с переводом строки — их отклоняет _ExifToolProcess)
+        """
+        file_paths = [p for p in file_paths if '\n' not in p and '\r' not in p]
+        if not file_paths:
+            return {}
+        output = self._exiftool_pool.execute(*self._exiftool_args(all_tags), *file_paths)
+        if not output.strip():
+            return {}
+        data = self._load_exiftool_json(output)
+        # ExifTool возвращает путь в SourceFile (в Windows — с прямыми слэшами)
+        by_path = {os.path.normcase(os.path.normpath(p)): p for p in file_paths}
+        result = {}
+        for item in data:
+            path = by_path.get(os.path.normcase(os.path.normpath(item.get('SourceFile', ''))))
+            if path is not None:
+                result[path] = item
+        return result
+    
+    def _exiftool_args(self, all_tags: bool) -> Tuple[str, ...]:
+        """Аргументы ExifTool перед путями файлов."""
+        if all_tags:
+            return tuple(self.DEEP_EXIFTOOL_ARGS)
+        return (*(self.DEEP_EXIFTOOL_ARGS if self.deep else self.EXIFTOOL_ARGS), *self._EXIFTOOL_TAGS)
+    
+    def _run_native(self, file_path: str, stat: Optional[os.stat_result],
+                    include_raw_exif: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Быстрое чтение метаданных без ExifTool (mmap, exifread, pyexiv2).
+        
+        Returns:
+            Метаданные или None, если нужен ExifTool: нужны сырые данные или режим deep,
+            библиотеки не установлены, тип файла не распознан, shutter count не найден
+            или makernote производителя backend читает не полностью.
+        """
+        if include_raw_exif or self.deep or stat is None:
+            return None
+        for backend in self._backends_by_ext.get(_suffix(file_path).lower(), ()):
+            try:
+                exif = backend.read(file_path)
+            except Exception:
+                continue
+            make = str(exif.get('EXIF:Make', '')).upper()
+            if make and not make.startswith(backend.COMPLETE_MAKES):
+                # Производитель известен и не поддерживается: другие backends не помогут
+                return None
+            if 'File:FileType' in exif and make and self._find_shutter_count(exif)[0] is not None:
+                exif.setdefault('File:FileModifyDate', _exif_file_date(stat))
+                return exif
+        return None
+    
+    def _parse_exiftool_json(self, output: bytes) -> Dict[str, Any]:
+        """Разбор JSON-ответа ExifTool для одного файла."""
+        if not output.strip():
+            raise RuntimeError("ExifTool не вернул данных")
+        data = self._load_exiftool_json(output)
+        return data[0] if data else {}
+    
+    def _load_exiftool_json(self, output: bytes) -> List[Dict[str, Any]]:
+        """Разбор JSON ExifTool из байтов; некорректный UTF-8 заменяется."""
         try:
-            # -j: JSON output
-            # -G: Group names
-            # -a: Allow duplicate tags
-            # -u: Unknown tags
-            # -n: Numeric values
-            result = subprocess.run(
-                [self.exiftool_path, '-j', '-G', '-a', '-u', '-n', file_path],
-                capture_output=True, text=True, timeout=30,
-                encoding='utf-8', errors='replace'
-            )
-            
-            if result.returncode != 0 and not result.stdout:
-                raise RuntimeError(f"ExifTool error: {result.stderr}")
-            
-            data = json.loads(result.stdout)
-            return data[0] if data else {}
-            
-        except subprocess.TimeoutExpired:
-            raise RuntimeError(f"ExifTool timeout for {file_path}")
+            return _json_loads(output)
+        except ValueError:
+            pass  # JSONDecodeError или UnicodeDecodeError: пробуем после замены байтов
+        try:
+            return _json_loads(output.decode('utf-8', 'replace'))
         except json.JSONDecodeError as e:
             raise RuntimeError(f"Failed to parse ExifTool JSON: {e}")
     
-    def _get_tag_value(self, exif: Dict, *tag_names: str) -> Optional[Any]:
-        """Получить значение тега по списку возможных имён."""
+    def _index_exif(self, exif: Dict) -> Tuple[Dict, Dict]:
+        """
+        Индекс метаданных для _get_tag_value: (исходный словарь, имя тега без группы -> значение).
+        
+        При нескольких группах с одним тегом берётся первый ключ, как при линейном поиске.
+        """
+        by_name: Dict[str, Any] = {}
+        for key, value in exif.items():
+            by_name.setdefault(key.rpartition(':')[2], value)
+        return exif, by_name
+    
+    def _get_tag_value(self, index: Tuple[Dict, Dict], *tag_names: str) -> Optional[Any]:
+        """Получить значение тега по списку возможных имён (index — из _index_exif)."""
+        exif, by_name = index
         for tag in tag_names:
             # Прямой поиск
             if tag in exif:
                 return exif[tag]
-            # Поиск с группой (например "EXIF:Make")
-            for key, value in exif.items():
-                if key.endswith(':' + tag) or key == tag:
-                    return value
+            # Поиск с группой (например "EXIF:Make" для имени "Make")
+            if ':' not in tag and tag in by_name:
+                return by_name[tag]
         return None
     
     def _extract_file_number(self, filename: str) -> Optional[int]:
         """Извлечь номер файла из имени (IMG_1234.CR2 -> 1234)."""
-        # Паттерны: IMG_1234, DSC_1234, _MG_1234, etc.
-        patterns = [
-            r'(?:IMG|DSC|_MG|_DSC)_?(\d+)',
-            r'(\d{4,})\.(?:jpg|jpeg|cr2|cr3|nef|arw)',
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, filename, re.IGNORECASE)
-            if match:
-                return int(match.group(1))
+        match = _FILE_NUMBER_RE.search(filename)
+        if match:
+            return int(match.group(1) or match.group(2))
         return None
     
     def _check_editing_software(self, software: Optional[str], processing: Optional[str]) -> Tuple[bool, Optional[str]]:
         """Проверить, был ли файл обработан редактором."""
         all_software = ' '.join(filter(None, [software, processing])).lower()
         
-        for editor in self.KNOWN_EDITORS:
-            if editor in all_software:
-                return True, f"Обнаружен редактор/платформа: {editor.title()}. Метаданные могут быть изменены или удалены."
+        if self._editor_automaton is not None:
+            # Один проход по строке; при нескольких совпадениях — первый по списку
+            found = min((value for _, value in self._editor_automaton.iter(all_software)), default=None)
+            editor = found[1] if found else None
+        else:
+            editor = next((e for e in self.KNOWN_EDITORS if e in all_software), None)
+        
+        if editor:
+            return True, f"Обнаружен редактор/платформа: {editor.title()}. Метаданные могут быть изменены или удалены."
         
         return False, None
     
@@ -245,75 +1141,111 @@ class PhotoShutterInspector:
         Returns:
             (shutter_count или None, источник тега)
         """
-        # Прямой поиск по известным тегам
-        for tag_pattern in self.SHUTTER_COUNT_TAGS:
-            for key, value in exif.items():
-                # Проверяем ключ (с учётом групп)
-                key_lower = key.lower()
-                tag_lower = tag_pattern.lower()
-                
-                if tag_lower in key_lower or key_lower.endswith(':' + tag_lower.split(':')[-1]):
-                    if isinstance(value, (int, float)) and value > 0:
-                        return int(value), key
-                    elif isinstance(value, str) and value.isdigit():
-                        return int(value), key
+        # Один проход по ключам: имя тега без группы -> приоритет в SHUTTER_COUNT_TAGS
+        best = None  # (приоритет, значение, ключ)
+        for key, value in exif.items():
+            priority = self._SHUTTER_TAG_PRIORITY.get(key.rpartition(':')[2].lower())
+            if priority is None or (best is not None and priority >= best[0]):
+                continue
+            # С -n ExifTool отдаёт числа, int() для них почти бесплатен
+            try:
+                count = int(value)
+            except (TypeError, ValueError, OverflowError):
+                continue
+            if count > 0:
+                best = (priority, count, key)
         
+        if best is not None:
+            return best[1], best[2]
         return None, "none"
     
-    def analyze_file(self, file_path: str, include_raw_exif: bool = False) -> FileAnalysis:
+    def analyze_file(self, file_path: str, include_raw_exif: bool = False, *,
+                     stat: Optional[os.stat_result] = None) -> FileAnalysis:
         """
         Анализ одного файла.
         
         Args:
             file_path: Путь к файлу
             include_raw_exif: Включить сырые данные ExifTool в результат
+            stat: Уже полученный os.stat файла (например, из os.scandir)
             
         Returns:
             Результат анализа
         """
+        # Один stat на файл: и для ключа кэша, и для размера
+        if stat is None:
+            stat = _stat(file_path)
+        key = self._cache_key(file_path, stat)
+        cached = self._lookup(key, include_raw_exif)
+        if cached is not None:
+            return cached
+        analysis = self._analyze_exif(file_path, include_raw_exif, stat)
+        self._store([(key, analysis)], include_raw_exif)
+        return analysis
+    
+    def _lookup(self, key: Optional[Tuple[str, int, int]], include_raw_exif: bool) -> Optional[FileAnalysis]:
+        """Готовый результат из памяти или SQLite."""
+        if not key:
+            return None
+        cached = self._memo_get(key, include_raw_exif)
+        if cached is None and self._cache_db is not None and not include_raw_exif:
+            cached = self._cache_get(key)
+            if cached is not None:
+                self._memo_put(key, include_raw_exif, cached)
+        return cached
+    
+    def _store(self, items: List[Tuple[Optional[Tuple[str, int, int]], FileAnalysis]],
+               include_raw_exif: bool) -> None:
+        """Записать результаты (ключ кэша, анализ) в память и SQLite (одной транзакцией)."""
+        # Кэшируются только файлы, метаданные которых удалось прочитать
+        items = [(key, analysis) for key, analysis in items if key and analysis.real_file_type]
+        for key, analysis in items:
+            self._memo_put(key, include_raw_exif, analysis)
+        if items and self._cache_db is not None and not include_raw_exif:
+            self._cache_put(items)
+    
+    def _analyze_exif(self, file_path: str, include_raw_exif: bool,
+                      stat: Optional[os.stat_result] = None, exif: Optional[Dict] = None) -> FileAnalysis:
+        """Анализ файла по метаданным ExifTool (exif — уже прочитанные метаданные, если есть)."""
         path = Path(file_path)
+        suffix = _suffix(path.name)
+        lower_suffix = suffix.lower()
         
         # Базовая информация
         analysis = FileAnalysis(
             file_name=path.name,
             file_path=str(path.absolute()),
-            file_type=path.suffix.lower().lstrip('.'),
-            file_size_bytes=path.stat().st_size if path.exists() else 0
+            file_type=lower_suffix[1:],
+            file_size_bytes=stat.st_size if stat else 0
         )
         
         # Проверка расширения
-        if path.suffix.lower() not in self.SUPPORTED_EXTENSIONS:
-            analysis.errors.append(f"Неподдерживаемый тип файла: {path.suffix}")
+        if lower_suffix not in self.SUPPORTED_EXTENSIONS:
+            analysis.errors.append(f"Неподдерживаемый тип файла: {suffix}")
             return analysis
         
-        try:
-            exif = self._run_exiftool(str(path))
-        except Exception as e:
-            analysis.errors.append(f"Ошибка чтения EXIF: {str(e)}")
-            return analysis
+        if exif is None:
+            try:
+                exif = (self._run_native(str(path), stat, include_raw_exif)
+                        or self._run_exiftool(str(path), all_tags=include_raw_exif))
+            except Exception as e:
+                analysis.errors.append(f"Ошибка чтения EXIF: {str(e)}")
+                return analysis
         
         if include_raw_exif:
             analysis.raw_exif = exif
         
+        tags = self._index_exif(exif)
+        
         # === Определение реального типа файла ===
-        analysis.real_file_type = self._get_tag_value(exif, 'FileType', 'File:FileType')
-        analysis.mime_type = self._get_tag_value(exif, 'MIMEType', 'File:MIMEType')
+        analysis.real_file_type = self._get_tag_value(tags, 'FileType', 'File:FileType')
+        analysis.mime_type = self._get_tag_value(tags, 'MIMEType', 'File:MIMEType')
         
         # Проверка на несоответствие расширения и реального типа
-        expected_types = {
-            'cr2': ['CR2'],
-            'cr3': ['CR3'],
-            'jpg': ['JPEG', 'JPG'],
-            'jpeg': ['JPEG', 'JPG'],
-            'nef': ['NEF'],
-            'arw': ['ARW'],
-            'orf': ['ORF'],
-            'rw2': ['RW2'],
-            'dng': ['DNG'],
-        }
         ext = analysis.file_type.lower()
-        if ext in expected_types:
-            if analysis.real_file_type and analysis.real_file_type.upper() not in expected_types[ext]:
+        expected = _EXPECTED_FILE_TYPES.get(ext)
+        if expected is not None:
+            if analysis.real_file_type and analysis.real_file_type.upper() not in expected:
                 analysis.file_type_mismatch = True
                 analysis.errors.append(
                     f"🚨 ВНИМАНИЕ: Расширение файла ({ext.upper()}) НЕ соответствует реальному типу ({analysis.real_file_type})! "
@@ -322,24 +1254,27 @@ class PhotoShutterInspector:
                 analysis.exif_integrity_notes.append(
                     f"Файл имеет расширение .{ext}, но на самом деле это {analysis.real_file_type} ({analysis.mime_type})"
                 )
+                # Остальные метаданные поддельного файла ничего не доказывают
+                if not include_raw_exif:
+                    return analysis
         
         # === Основные данные камеры ===
-        analysis.camera_make = self._get_tag_value(exif, 'Make', 'EXIF:Make')
-        analysis.camera_model = self._get_tag_value(exif, 'Model', 'EXIF:Model', 'Camera Model Name')
-        analysis.lens_model = self._get_tag_value(exif, 'LensModel', 'Lens', 'LensType', 'EXIF:LensModel')
-        analysis.serial_number = self._get_tag_value(exif, 
+        analysis.camera_make = self._get_tag_value(tags, 'Make', 'EXIF:Make')
+        analysis.camera_model = self._get_tag_value(tags, 'Model', 'EXIF:Model', 'Camera Model Name')
+        analysis.lens_model = self._get_tag_value(tags, 'LensModel', 'Lens', 'LensType', 'EXIF:LensModel')
+        analysis.serial_number = self._get_tag_value(tags, 
             'SerialNumber', 'CameraSerialNumber', 'InternalSerialNumber',
             'Canon:SerialNumber', 'EXIF:SerialNumber'
         )
-        analysis.internal_serial = self._get_tag_value(exif, 'InternalSerialNumber', 'Canon:InternalSerialNumber')
-        analysis.firmware = self._get_tag_value(exif, 'Firmware', 'FirmwareVersion', 'Software')
+        analysis.internal_serial = self._get_tag_value(tags, 'InternalSerialNumber', 'Canon:InternalSerialNumber')
+        analysis.firmware = self._get_tag_value(tags, 'Firmware', 'FirmwareVersion', 'Software')
         
         # === Дата/время ===
-        analysis.datetime_original = self._get_tag_value(exif, 
+        analysis.datetime_original = self._get_tag_value(tags, 
             'DateTimeOriginal', 'EXIF:DateTimeOriginal', 'CreateDate'
         )
-        analysis.datetime_digitized = self._get_tag_value(exif, 'DateTimeDigitized', 'EXIF:DateTimeDigitized')
-        analysis.file_modify_date = self._get_tag_value(exif, 'FileModifyDate', 'File:FileModifyDate')
+        analysis.datetime_digitized = self._get_tag_value(tags, 'DateTimeDigitized', 'EXIF:DateTimeDigitized')
+        analysis.file_modify_date = self._get_tag_value(tags, 'FileModifyDate', 'File:FileModifyDate')
         
         # === ГЛАВНОЕ: Shutter Count ===
         shutter, source = self._find_shutter_count(exif)
@@ -357,16 +1292,16 @@ class PhotoShutterInspector:
         analysis.file_number_hint = self._extract_file_number(path.name)
         
         # FileNumber из EXIF
-        exif_file_num = self._get_tag_value(exif, 'FileNumber', 'Canon:FileNumber', 'FileIndex')
+        exif_file_num = self._get_tag_value(tags, 'FileNumber', 'Canon:FileNumber', 'FileIndex')
         if exif_file_num and isinstance(exif_file_num, (int, float)):
             analysis.file_number_hint = int(exif_file_num)
         
-        analysis.directory_number = self._get_tag_value(exif, 'DirectoryIndex', 'Canon:DirectoryIndex')
-        analysis.image_unique_id = self._get_tag_value(exif, 'ImageUniqueID', 'EXIF:ImageUniqueID')
+        analysis.directory_number = self._get_tag_value(tags, 'DirectoryIndex', 'Canon:DirectoryIndex')
+        analysis.image_unique_id = self._get_tag_value(tags, 'ImageUniqueID', 'EXIF:ImageUniqueID')
         
         # === Детектор обработки ===
-        analysis.software = self._get_tag_value(exif, 'Software', 'EXIF:Software')
-        analysis.processing_software = self._get_tag_value(exif, 'ProcessingSoftware', 'EXIF:ProcessingSoftware')
+        analysis.software = self._get_tag_value(tags, 'Software', 'EXIF:Software')
+        analysis.processing_software = self._get_tag_value(tags, 'ProcessingSoftware', 'EXIF:ProcessingSoftware')
         
         edited, warning = self._check_editing_software(analysis.software, analysis.processing_software)
         analysis.not_out_of_camera = edited
@@ -376,19 +1311,19 @@ class PhotoShutterInspector:
             analysis.exif_integrity_notes.append(warning)
         
         # === Технические параметры съёмки ===
-        analysis.iso = self._get_tag_value(exif, 'ISO', 'EXIF:ISO')
-        analysis.aperture = str(self._get_tag_value(exif, 'FNumber', 'Aperture', 'ApertureValue') or '')
-        analysis.shutter_speed = str(self._get_tag_value(exif, 'ExposureTime', 'ShutterSpeed', 'ShutterSpeedValue') or '')
-        analysis.focal_length = str(self._get_tag_value(exif, 'FocalLength', 'EXIF:FocalLength') or '')
+        analysis.iso = self._get_tag_value(tags, 'ISO', 'EXIF:ISO')
+        analysis.aperture = str(self._get_tag_value(tags, 'FNumber', 'Aperture', 'ApertureValue') or '')
+        analysis.shutter_speed = str(self._get_tag_value(tags, 'ExposureTime', 'ShutterSpeed', 'ShutterSpeedValue') or '')
+        analysis.focal_length = str(self._get_tag_value(tags, 'FocalLength', 'EXIF:FocalLength') or '')
         
         # Размеры
-        analysis.image_width = self._get_tag_value(exif, 'ImageWidth', 'ExifImageWidth')
-        analysis.image_height = self._get_tag_value(exif, 'ImageHeight', 'ExifImageHeight')
+        analysis.image_width = self._get_tag_value(tags, 'ImageWidth', 'ExifImageWidth')
+        analysis.image_height = self._get_tag_value(tags, 'ImageHeight', 'ExifImageHeight')
         
         # === Проверки целостности ===
         # Проверка на ресайз (признак обработки)
-        orig_width = self._get_tag_value(exif, 'OriginalImageWidth')
-        orig_height = self._get_tag_value(exif, 'OriginalImageHeight')
+        orig_width = self._get_tag_value(tags, 'OriginalImageWidth')
+        orig_height = self._get_tag_value(tags, 'OriginalImageHeight')
         if orig_width and orig_height:
             if analysis.image_width and (orig_width != analysis.image_width or orig_height != analysis.image_height):
                 analysis.exif_integrity_notes.append(
@@ -396,22 +1331,129 @@ class PhotoShutterInspector:
                 )
         
         # Проверка XMP (признак обработки)
-        xmp_creator = self._get_tag_value(exif, 'XMP:CreatorTool', 'CreatorTool')
+        xmp_creator = self._get_tag_value(tags, 'XMP:CreatorTool', 'CreatorTool')
         if xmp_creator:
             analysis.exif_integrity_notes.append(f"XMP CreatorTool: {xmp_creator}")
         
         return analysis
     
-    def analyze_directory(self, dir_path: str, include_raw_exif: bool = False) -> List[FileAnalysis]:
-        """Анализ всех поддерживаемых файлов в директории."""
+    def list_directory(self, dir_path: str, recursive: bool = False) -> List[str]:
+        """Пути всех поддерживаемых файлов в директории (recursive — и в поддиректориях)."""
+        return [entry.path for entry in _iter_photos(dir_path, recursive)]
+    
+    def iter_directory(self, dir_path: str, include_raw_exif: bool = False,
+                       recursive: bool = False) -> Iterator[FileAnalysis]:
+        """Анализ файлов директории с выдачей результата сразу после каждого файла."""
+        return self.analyze_directory_batch(_iter_photos(dir_path, recursive), include_raw_exif)
+    
+    def analyze_directory(self, dir_path: str, include_raw_exif: bool = False,
+                          recursive: bool = False) -> List[FileAnalysis]:
+        """Анализ всех поддерживаемых файлов в директории (отсортировано по дате съёмки)."""
+        return sorted(self.iter_directory(dir_path, include_raw_exif, recursive),
+                      key=lambda x: x.datetime_original or '')
+    
+    def analyze_directory_batch(self, paths: Iterable[Union[str, os.DirEntry]],
+                                include_raw_exif: bool = False) -> Iterator[FileAnalysis]:
+        """
+        Параллельный анализ списка файлов на пуле процессов ExifTool.
+        
+        Результаты выдаются в порядке paths по мере готовности;
+        записи в кэш — одной транзакцией на пачку. Для записей os.scandir
+        используется их stat, без повторного обращения к диску.
+        Файлы не из кэша читаются пачками по BULK_SIZE на одну команду ExifTool.
+        
+        paths может быть генератором (например, обход директории): анализ
+        первых пачек идёт, пока обход ещё продолжается.
+        """
+        paths = iter(paths)
+        head = list(islice(paths, self.workers * self.BULK_SIZE))
+        if not head:
+            return
+        # Пачки поменьше, если файлов мало: все процессы пула должны быть заняты
+        size = max(1, min(self.BULK_SIZE, -(-len(head) // self.workers)))
+        
+        def chunks():
+            for i in range(0, len(head), size):
+                yield head[i:i + size]
+            while chunk := list(islice(paths, size)):
+                yield chunk
+        
+        yield from self._map_chunks(lambda chunk: self._analyze_chunk(chunk, include_raw_exif), chunks())
+    
+    def iter_raw_exif(self, paths: Iterable[str]) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        Полные сырые данные ExifTool (-a -u) для файлов, в порядке paths.
+        
+        Читаются пачками по BULK_SIZE параллельно на пуле; в памяти — несколько
+        пачек, а не данные всех файлов. None — если ExifTool файл не прочитал.
+        """
+        def read(chunk):
+            try:
+                raw = self._run_exiftool_many(chunk, all_tags=True)
+            except Exception:
+                raw = {}
+            return [raw[path] if path in raw else self._read_raw_exif(path) for path in chunk]
+        
+        paths = iter(paths)
+        return self._map_chunks(read, iter(lambda: list(islice(paths, self.BULK_SIZE)), []))
+    
+    def _read_raw_exif(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Сырые данные одного файла (если пачка его не прочитала); None — при ошибке."""
+        try:
+            return self._run_exiftool(file_path, all_tags=True)
+        except Exception:
+            return None
+    
+    def _map_chunks(self, fn, chunks: Iterable[List]) -> Iterator:
+        """Применить fn к пачкам на пуле потоков и выдать элементы результатов по порядку."""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Не больше двух пачек на процесс в работе: источник не убегает далеко вперёд
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(fn, chunk))
+                if len(pending) >= 2 * self.workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    
+    def _analyze_chunk(self, paths: List[Union[str, os.DirEntry]], include_raw_exif: bool) -> List[FileAnalysis]:
+        """Анализ пачки файлов: кэш, затем чтение промахов одной командой ExifTool."""
         results = []
-        path = Path(dir_path)
+        misses = []  # (индекс, путь, stat, ключ кэша)
+        for p in paths:
+            path = p.path if isinstance(p, os.DirEntry) else p
+            stat = _stat(p)
+            key = self._cache_key(path, stat)
+            cached = self._lookup(key, include_raw_exif)
+            if cached is None:
+                misses.append((len(results), path, stat, key))
+            results.append(cached)
+        
+        # Диск читает заголовки всей пачки, пока разбираются первые файлы
+        supported = [path for _, path, _, _ in misses if _suffix(path).lower() in self.SUPPORTED_EXTENSIONS]
+        if supported:
+            # Первый промах кэша: процессы ExifTool загружаются, пока идут быстрые чтения;
+            # полностью закэшированный запуск ExifTool не запускает вовсе
+            self.warm_up(min(self.workers, len(supported)))
+        for path in supported:
+            _readahead(path)
         
-        for file_path in path.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in self.SUPPORTED_EXTENSIONS:
-                results.append(self.analyze_file(str(file_path), include_raw_exif))
+        # Сначала быстрые библиотеки, остальное — ExifTool за один вызов
+        stats = {path: stat for _, path, stat, _ in misses}
+        exifs = {path: self._run_native(path, stats[path], include_raw_exif) for path in supported}
+        remaining = [path for path, exif in exifs.items() if exif is None]
+        if remaining:
+            try:
+                exifs.update(self._run_exiftool_many(remaining, all_tags=include_raw_exif))
+            except Exception:
+                pass  # Такие файлы прочитаются по одному, с сообщением об ошибке в анализе
         
-        return sorted(results, key=lambda x: x.datetime_original or '')
+        stored = []
+        for index, path, stat, key in misses:
+            results[index] = self._analyze_exif(path, include_raw_exif, stat, exifs.get(path))
+            stored.append((key, results[index]))
+        self._store(stored, include_raw_exif)
+        return results
     
     def compare_files(self, file1_path: str, file2_path: str) -> ComparisonResult:
         """
@@ -419,8 +1461,8 @@ class PhotoShutterInspector:
         
         Режим проверки продавца на Авито и т.п.
         """
-        analysis1 = self.analyze_file(file1_path)
-        analysis2 = self.analyze_file(file2_path)
+        # Оба файла — одной пачкой: параллельно на пуле или одной командой ExifTool
+        analysis1, analysis2 = self.analyze_directory_batch([file1_path, file2_path])
         
         reasons = []
         verdict = VerificationResult.INCONCLUSIVE
@@ -464,10 +1506,8 @@ class PhotoShutterInspector:
         time_seq_valid = None
         if analysis1.datetime_original and analysis2.datetime_original:
             try:
-                # Парсинг даты (формат EXIF: "2024:01:15 14:30:00")
-                fmt = "%Y:%m:%d %H:%M:%S"
-                dt1 = datetime.strptime(analysis1.datetime_original.split('.')[0].split('+')[0], fmt)
-                dt2 = datetime.strptime(analysis2.datetime_original.split('.')[0].split('+')[0], fmt)
+                dt1 = _parse_exif_datetime(analysis1.datetime_original)
+                dt2 = _parse_exif_datetime(analysis2.datetime_original)
                 time_diff = (dt2 - dt1).total_seconds()
                 
                 if time_diff >= 0:
@@ -519,106 +1559,92 @@ class PhotoShutterInspector:
         )
 
 
+_RULE = "-" * 70
+_DOUBLE_RULE = "=" * 70
+
+# Неизменяемые блоки отчёта format_analysis_pretty
+_PRETTY_MISMATCH = """
+   🚨🚨🚨 ВНИМАНИЕ! ФАЙЛ ПОДДЕЛЬНЫЙ! 🚨🚨🚨
+   Расширение .{file_type} НЕ соответствует содержимому ({real_file_type})
+   Это НЕ настоящий RAW файл с камеры!
+"""
+
+_PRETTY_SHUTTER_MISSING = """   ❌ НЕ НАЙДЕН В ФАЙЛЕ
+   
+   Shutter count в EXIF отсутствует — по этому файлу определить
+   точный пробег НЕВОЗМОЖНО.
+   
+   Для Canon (200D, 600D, 700D и др.) это нормально — данные
+   о пробеге не записываются в RAW/JPG.
+   
+   ➡️  Для определения пробега используйте:
+       • Подключение камеры по USB + EOSInfo/ShutterCheck
+       • Сервисный центр Canon"""
+
+
 def format_analysis_pretty(analysis: FileAnalysis) -> str:
     """Форматирование результата для человека."""
-    lines = []
-    lines.append("=" * 70)
-    lines.append(f"📁 ФАЙЛ: {analysis.file_name}")
-    lines.append(f"   Путь: {analysis.file_path}")
-    lines.append(f"   Расширение: {analysis.file_type.upper()} | Размер: {analysis.file_size_bytes / 1024 / 1024:.2f} MB")
-    
-    # Показать реальный тип файла
-    if analysis.real_file_type:
-        lines.append(f"   Реальный тип: {analysis.real_file_type} ({analysis.mime_type or 'н/д'})")
-    
-    # Предупреждение о несоответствии
-    if analysis.file_type_mismatch:
-        lines.append("")
-        lines.append("   🚨🚨🚨 ВНИМАНИЕ! ФАЙЛ ПОДДЕЛЬНЫЙ! 🚨🚨🚨")
-        lines.append(f"   Расширение .{analysis.file_type} НЕ соответствует содержимому ({analysis.real_file_type})")
-        lines.append("   Это НЕ настоящий RAW файл с камеры!")
-        lines.append("")
+    a = analysis
+    size_mb = a.file_size_bytes / 1024 / 1024
     
-    lines.append("-" * 70)
-    
-    # Камера
-    lines.append("📷 КАМЕРА:")
-    lines.append(f"   Производитель: {analysis.camera_make or 'н/д'}")
-    lines.append(f"   Модель: {analysis.camera_model or 'н/д'}")
-    lines.append(f"   Серийный номер: {analysis.serial_number or 'не записан в файле'}")
-    lines.append(f"   Прошивка: {analysis.firmware or 'н/д'}")
-    lines.append(f"   Объектив: {analysis.lens_model or 'н/д'}")
-    
-    lines.append("-" * 70)
+    # Необязательные и переменные блоки — заранее, затем один шаблон
+    real_type = f"\n   Реальный тип: {a.real_file_type} ({a.mime_type or 'н/д'})" if a.real_file_type else ""
+    mismatch = (
+        "\n" + _PRETTY_MISMATCH.format(file_type=a.file_type, real_file_type=a.real_file_type)
+        if a.file_type_mismatch else ""
+    )
     
-    # ГЛАВНОЕ: Пробег
-    lines.append("🔢 ПРОБЕГ ЗАТВОРА (SHUTTER COUNT):")
-    if analysis.shutter_count_present:
-        lines.append(f"   ✅ НАЙДЕН: {analysis.shutter_count:,} срабатываний")
-        lines.append(f"   Источник: {analysis.shutter_count_source}")
+    if a.shutter_count_present:
+        shutter = f"   ✅ НАЙДЕН: {a.shutter_count:,} срабатываний\n   Источник: {a.shutter_count_source}"
     else:
-        lines.append("   ❌ НЕ НАЙДЕН В ФАЙЛЕ")
-        lines.append("   ")
-        lines.append("   Shutter count в EXIF отсутствует — по этому файлу определить")
-        lines.append("   точный пробег НЕВОЗМОЖНО.")
-        lines.append("   ")
-        lines.append("   Для Canon (200D, 600D, 700D и др.) это нормально — данные")
-        lines.append("   о пробеге не записываются в RAW/JPG.")
-        lines.append("   ")
-        lines.append("   ➡️  Для определения пробега используйте:")
-        lines.append("       • Подключение камеры по USB + EOSInfo/ShutterCheck")
-        lines.append("       • Сервисный центр Canon")
+        shutter = _PRETTY_SHUTTER_MISSING
     
-    lines.append("-" * 70)
-    
-    # Косвенные данные
-    lines.append("📊 КОСВЕННЫЕ ДАННЫЕ (⚠️ НЕ являются пробегом!):")
-    if analysis.file_number_hint:
-        lines.append(f"   Номер файла (FileIndex): {analysis.file_number_hint}")
-        lines.append(f"   ⚠️ {analysis.file_number_warning}")
+    if a.file_number_hint:
+        hints = f"   Номер файла (FileIndex): {a.file_number_hint}\n   ⚠️ {a.file_number_warning}"
     else:
-        lines.append("   Номер файла: не определён")
-    
-    if analysis.directory_number:
-        lines.append(f"   Номер папки: {analysis.directory_number}")
-    if analysis.image_unique_id:
-        lines.append(f"   ImageUniqueID: {analysis.image_unique_id}")
-    
-    lines.append("-" * 70)
+        hints = "   Номер файла: не определён"
+    if a.directory_number:
+        hints += f"\n   Номер папки: {a.directory_number}"
+    if a.image_unique_id:
+        hints += f"\n   ImageUniqueID: {a.image_unique_id}"
     
-    # Дата съёмки
-    lines.append("📅 ДАТА СЪЁМКИ:")
-    lines.append(f"   Оригинал: {analysis.datetime_original or 'н/д'}")
-    lines.append(f"   Модификация файла: {analysis.file_modify_date or 'н/д'}")
+    extra = ""
+    if a.not_out_of_camera or a.exif_integrity_notes:
+        warnings = [f"   🔴 {a.editing_detected_warning}"] if a.not_out_of_camera else []
+        warnings += [f"   • {note}" for note in a.exif_integrity_notes if note != a.editing_detected_warning]
+        extra += f"\n{_RULE}\n⚠️ ПРЕДУПРЕЖДЕНИЯ:" + "".join("\n" + w for w in warnings)
+    if a.errors:
+        extra += f"\n{_RULE}\n❌ ОШИБКИ:" + "".join(f"\n   {err}" for err in a.errors)
     
-    # Параметры съёмки
-    lines.append("-" * 70)
-    lines.append("⚙️ ПАРАМЕТРЫ СЪЁМКИ:")
-    lines.append(f"   ISO: {analysis.iso or 'н/д'}")
-    lines.append(f"   Диафрагма: f/{analysis.aperture}" if analysis.aperture else "   Диафрагма: н/д")
-    lines.append(f"   Выдержка: {analysis.shutter_speed}" if analysis.shutter_speed else "   Выдержка: н/д")
-    lines.append(f"   Фокусное: {analysis.focal_length}" if analysis.focal_length else "   Фокусное: н/д")
-    lines.append(f"   Размер: {analysis.image_width}x{analysis.image_height}" if analysis.image_width else "   Размер: н/д")
-    
-    # Предупреждения
-    if analysis.not_out_of_camera or analysis.exif_integrity_notes:
-        lines.append("-" * 70)
-        lines.append("⚠️ ПРЕДУПРЕЖДЕНИЯ:")
-        if analysis.not_out_of_camera:
-            lines.append(f"   🔴 {analysis.editing_detected_warning}")
-        for note in analysis.exif_integrity_notes:
-            if note != analysis.editing_detected_warning:
-                lines.append(f"   • {note}")
-    
-    # Ошибки
-    if analysis.errors:
-        lines.append("-" * 70)
-        lines.append("❌ ОШИБКИ:")
-        for err in analysis.errors:
-            lines.append(f"   {err}")
-    
-    lines.append("=" * 70)
-    return "\n".join(lines)
+    return f"""{_DOUBLE_RULE}
+📁 ФАЙЛ: {a.file_name}
+   Путь: {a.file_path}
+   Расширение: {a.file_type.upper()} | Размер: {size_mb:.2f} MB{real_type}{mismatch}
+{_RULE}
+📷 КАМЕРА:
+   Производитель: {a.camera_make or 'н/д'}
+   Модель: {a.camera_model or 'н/д'}
+   Серийный номер: {a.serial_number or 'не записан в файле'}
+   Прошивка: {a.firmware or 'н/д'}
+   Объектив: {a.lens_model or 'н/д'}
+{_RULE}
+🔢 ПРОБЕГ ЗАТВОРА (SHUTTER COUNT):
+{shutter}
+{_RULE}
+📊 КОСВЕННЫЕ ДАННЫЕ (⚠️ НЕ являются пробегом!):
+{hints}
+{_RULE}
+📅 ДАТА СЪЁМКИ:
+   Оригинал: {a.datetime_original or 'н/д'}
+   Модификация файла: {a.file_modify_date or 'н/д'}
+{_RULE}
+⚙️ ПАРАМЕТРЫ СЪЁМКИ:
+   ISO: {a.iso or 'н/д'}
+   Диафрагма: {f"f/{a.aperture}" if a.aperture else 'н/д'}
+   Выдержка: {a.shutter_speed or 'н/д'}
+   Фокусное: {a.focal_length or 'н/д'}
+   Размер: {f"{a.image_width}x{a.image_height}" if a.image_width else 'н/д'}{extra}
+{_DOUBLE_RULE}"""
 
 
 def format_comparison_pretty(result: ComparisonResult) -> str:
@@ -656,45 +1682,142 @@ def format_comparison_pretty(result: ComparisonResult) -> str:
 
 def analysis_to_dict(analysis: FileAnalysis) -> Dict:
     """Конвертация анализа в словарь для JSON/CSV."""
-    data = asdict(analysis)
-    # Убираем raw_exif для компактности (если нужен, добавить флаг)
-    if 'raw_exif' in data:
-        del data['raw_exif']
-    return data
-
-
-def save_json(analyses: List[FileAnalysis], output_path: str) -> None:
-    """Сохранение в JSON."""
-    data = [analysis_to_dict(a) for a in analyses]
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # raw_exif не включается для компактности (если нужен, добавить флаг)
+    return analysis.to_dict()
+
+
+def analysis_from_dict(data: Dict) -> FileAnalysis:
+    """Восстановление анализа из словаря (обратная операция к analysis_to_dict)."""
+    known = {f.name for f in fields(FileAnalysis)}
+    return FileAnalysis(**{k: v for k, v in data.items() if k in known})
+
+
+# Буфер записи JSON/CSV: меньше системных вызовов write на больших выгрузках
+_WRITE_BUFFER_SIZE = 1 << 20
+
+
+@contextmanager
+def _atomic_open(output_path: str, mode: str = 'wb', **kwargs):
+    """
+    Запись через временный файл рядом с целевым и os.replace в конце:
+    при сбое посреди выгрузки на месте output_path не остаётся обрезанного файла.
+    
+    Так пишутся только новые файлы и обычные файлы (права сохраняются);
+    /dev/stdout, символические ссылки, FIFO и т.п. открываются и пишутся на месте.
+    """
+    try:
+        st = os.lstat(output_path)
+    except FileNotFoundError:
+        st = None
+    if st is not None and not S_ISREG(st.st_mode):
+        with open(output_path, mode, buffering=_WRITE_BUFFER_SIZE, **kwargs) as f:
+            yield f
+        return
+    
+    # mkstemp: уникальное имя и O_EXCL — чужой файл или ссылка с тем же именем
+    # не перезаписываются, параллельные запуски не сталкиваются
+    directory, name = os.path.split(output_path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix=f".{name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, buffering=_WRITE_BUFFER_SIZE, **kwargs) as f:
+            # mkstemp создаёт файл с правами 0600: как у заменяемого файла или как у open()
+            if st is not None:
+                os.chmod(tmp_path, S_IMODE(st.st_mode))
+            else:
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(tmp_path, 0o666 & ~umask)
+            yield f
+            # Данные на диске до подмены: после сбоя — старый файл или новый целиком
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _dump_json(data: Any) -> bytes:
+    """JSON с отступом 2 в UTF-8 (orjson, если установлен)."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+
+
+def save_json(analyses: Iterable[FileAnalysis], output_path: str,
+              raw_exifs: Optional[Iterable[Optional[Dict]]] = None) -> None:
+    """
+    Сохранение в JSON: записи пишутся по одной, весь список в памяти не собирается.
+    
+    Args:
+        analyses: Результаты анализа
+        output_path: Файл JSON
+        raw_exifs: Сырые данные ExifTool в порядке analyses (например,
+            PhotoShutterInspector.iter_raw_exif) — пишутся в записи как raw_exif
+            и читаются по мере записи, а не держатся в памяти для всех файлов
+    """
+    raw = iter(raw_exifs) if raw_exifs is not None else None
+    with _atomic_open(output_path) as f:
+        sep = b'[\n  '
+        for analysis in analyses:
+            data = analysis_to_dict(analysis)
+            if raw is not None:
+                data['raw_exif'] = next(raw, None)
+            f.write(sep)
+            # Отступ элемента внутри списка, как у json.dump(..., indent=2)
+            f.write(_dump_json(data).replace(b'\n', b'\n  '))
+            sep = b',\n  '
+        f.write(b'[]' if sep == b'[\n  ' else b'\n]')
     print(f"✅ Сохранено в {output_path}")
 
 
+# Колонки CSV (атрибуты FileAnalysis) и выборка строки одним вызовом attrgetter
+CSV_COLUMNS = (
+    'file_name', 'file_type', 'camera_make', 'camera_model',
+    'serial_number', 'firmware', 'lens_model',
+    'datetime_original', 'shutter_count', 'shutter_count_present',
+    'shutter_count_source', 'file_number_hint', 'not_out_of_camera',
+    'iso', 'aperture', 'shutter_speed'
+)
+_csv_row = attrgetter(*CSV_COLUMNS)
+
+
 def save_csv(analyses: List[FileAnalysis], output_path: str) -> None:
     """Сохранение в CSV."""
     if not analyses:
         print("Нет данных для сохранения")
         return
     
-    # Основные колонки
-    columns = [
-        'file_name', 'file_type', 'camera_make', 'camera_model',
-        'serial_number', 'firmware', 'lens_model',
-        'datetime_original', 'shutter_count', 'shutter_count_present',
-        'shutter_count_source', 'file_number_hint', 'not_out_of_camera',
-        'iso', 'aperture', 'shutter_speed'
-    ]
-    
-    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
-        writer.writeheader()
-        for analysis in analyses:
-            writer.writerow(analysis_to_dict(analysis))
+    with _atomic_open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(map(_csv_row, analyses))
     
     print(f"✅ Сохранено в {output_path}")
 
 
+# Итоговая статистика CLI
+_SUMMARY = f"""{_RULE}
+📊 ИТОГО: {{total}} файлов
+   ✅ С пробегом затвора: {{with_shutter}}
+   ❌ Без пробега (невозможно определить по файлу): {{without_shutter}}
+   ⚠️  Обработанных/экспортированных: {{edited}}
+"""
+
+
+def _stdout_discarded() -> bool:
+    """stdout перенаправлен в os.devnull (вывод никто не прочитает)."""
+    try:
+        out = os.fstat(sys.stdout.fileno())
+        null = os.stat(os.devnull)
+    except (OSError, ValueError, AttributeError):
+        return False
+    return (out.st_dev, out.st_ino) == (null.st_dev, null.st_ino)
+
+
 def main():
     """Главная CLI-функция."""
     parser = argparse.ArgumentParser(
@@ -727,6 +1850,23 @@ PhotoShutterInspector — Честный анализатор EXIF для про
         '--raw-exif', action='store_true',
         help='Включить сырые данные ExifTool в JSON'
     )
+    parser.add_argument(
+        '--cache', nargs='?', const=str(DEFAULT_CACHE_PATH), metavar='PATH',
+        help=f'Кэш результатов между запусками: неизменённые файлы не читаются заново '
+             f'(файл по умолчанию: {DEFAULT_CACHE_PATH})'
+    )
+    parser.add_argument(
+        '--recursive', '-r', action='store_true',
+        help='Искать файлы и во вложенных папках'
+    )
+    parser.add_argument(
+        '--jobs', '-j', type=int, metavar='N',
+        help='Сколько файлов анализировать параллельно (по умолчанию: число ядер)'
+    )
+    parser.add_argument(
+        '--deep', action='store_true',
+        help='Полное чтение ExifTool (-a -u, без -fast) — медленнее, для диагностики'
+    )
     parser.add_argument(
         '--compare', dest='compare_file',
         help='Сравнить с другим файлом (режим проверки продавца)'
@@ -737,38 +1877,43 @@ PhotoShutterInspector — Честный анализатор EXIF для про
     )
     
     args = parser.parse_args()
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs должен быть не меньше 1")
     
     # Инициализация
     try:
-        inspector = PhotoShutterInspector(exiftool_path=args.exiftool)
+        inspector = PhotoShutterInspector(exiftool_path=args.exiftool, workers=args.jobs, deep=args.deep,
+                                          cache_path=args.cache)
         print(f"ExifTool версия: {inspector.exiftool_version}")
     except RuntimeError as e:
         print(f"❌ ОШИБКА: {e}")
         sys.exit(1)
     
-    path = Path(args.path)
+    # Один stat на путь: и тип (файл/папка), и размер для анализа
+    path = args.path
+    st = _stat(path)
     
     # Режим сравнения
     if args.compare_file:
-        if not path.is_file():
+        if st is None or not S_ISREG(st.st_mode):
             print(f"❌ Для сравнения нужен файл, не директория: {path}")
             sys.exit(1)
         
-        result = inspector.compare_files(str(path), args.compare_file)
+        result = inspector.compare_files(path, args.compare_file)
         print(format_comparison_pretty(result))
         
         if args.json_output:
-            with open(args.json_output, 'w', encoding='utf-8') as f:
-                json.dump(asdict(result), f, ensure_ascii=False, indent=2, default=str)
+            with _atomic_open(args.json_output) as f:
+                f.write(_dump_json(result.to_dict()))
         sys.exit(0)
     
     # Обычный анализ
     analyses = []
     
-    if path.is_file():
-        analyses = [inspector.analyze_file(str(path), include_raw_exif=args.raw_exif)]
-    elif path.is_dir():
-        analyses = inspector.analyze_directory(str(path), include_raw_exif=args.raw_exif)
+    if st is not None and S_ISREG(st.st_mode):
+        analyses = [inspector.analyze_file(path, stat=st)]
+    elif st is not None and S_ISDIR(st.st_mode):
+        analyses = inspector.analyze_directory(path, recursive=args.recursive)
     else:
         print(f"❌ Путь не найден: {path}")
         sys.exit(1)
@@ -778,26 +1923,29 @@ PhotoShutterInspector — Честный анализатор EXIF для про
         sys.exit(0)
     
     # Вывод
-    if args.pretty or (not args.json_output and not args.csv_output):
-        for analysis in analyses:
-            print(format_analysis_pretty(analysis))
-            print()
+    # Отчёт в /dev/null не форматируется: это чистая потеря времени
+    if (args.pretty or (not args.json_output and not args.csv_output)) and not _stdout_discarded():
+        # Одна запись в stdout вместо двух print() (и flush на терминале) на файл
+        sys.stdout.write('\n\n'.join(map(format_analysis_pretty, analyses)) + '\n\n')
     
     if args.json_output:
-        save_json(analyses, args.json_output)
+        # Сырые данные читаются только здесь и только пока пишется JSON
+        raw_exifs = inspector.iter_raw_exif(a.file_path for a in analyses) if args.raw_exif else None
+        save_json(analyses, args.json_output, raw_exifs)
     
     if args.csv_output:
         save_csv(analyses, args.csv_output)
     
-    # Итоговая статистика
-    with_shutter = sum(1 for a in analyses if a.shutter_count_present)
-    edited = sum(1 for a in analyses if a.not_out_of_camera)
+    # Итоговая статистика (один проход)
+    with_shutter = edited = 0
+    for a in analyses:
+        with_shutter += a.shutter_count_present
+        edited += a.not_out_of_camera
     
-    print("-" * 70)
-    print(f"📊 ИТОГО: {len(analyses)} файлов")
-    print(f"   ✅ С пробегом затвора: {with_shutter}")
-    print(f"   ❌ Без пробега (невозможно определить по файлу): {len(analyses) - with_shutter}")
-    print(f"   ⚠️  Обработанных/экспортированных: {edited}")
+    sys.stdout.write(_SUMMARY.format(
+        total=len(analyses), with_shutter=with_shutter,
+        without_shutter=len(analyses) - with_shutter, edited=edited
+    ))
 
 
 if __name__ == '__main__':